@@ -1,12 +1,18 @@
 #! /usr/bin/python3 -B
 
 import argparse
+import collections
+import contextlib
+import cProfile
 import durations
+import json
 import logging
 import os
 import platform
+import pstats
 import select
 import socket
+import statistics
 import subprocess
 import sys
 import threading
@@ -60,6 +66,184 @@ class FanController():
 		def getTime(self):
 			return self.__time
 
+	class Timings():
+		"""
+		Collects how long the phases of the loop take, for --profile. Measuring costs nothing
+		until it is enabled.
+		"""
+		class Measurement():
+			def __init__(self, timings, phase):
+				self.__timings = timings
+				self.__phase = phase
+
+			def __enter__(self):
+				self.__start = time.perf_counter()
+
+			def __exit__(self, excType, excValue, excTraceback):
+				self.__timings.add(self.__phase, time.perf_counter() - self.__start)
+
+		def __init__(self):
+			self.__enabled = False
+			# phase -> [calls, total, max]
+			self.__phases = {}
+			self.__lock = threading.Lock()
+
+		def enable(self):
+			self.__enabled = True
+
+		def isEnabled(self):
+			return self.__enabled
+
+		def measure(self, phase):
+			if not self.__enabled:
+				return contextlib.nullcontext()
+			return FanController.Timings.Measurement(self, phase)
+
+		def add(self, phase, duration):
+			with self.__lock:
+				entry = self.__phases.setdefault(phase, [0, 0, 0])
+				entry[0] += 1
+				entry[1] += duration
+				entry[2] = max(entry[2], duration)
+
+		def report(self):
+			lines = ["{:<40} {:>7} {:>11} {:>10} {:>10}".format("phase", "calls", "total ms", "mean ms", "max ms")]
+			with self.__lock:
+				phases = sorted(self.__phases.items(), key=lambda item: item[1][1], reverse=True)
+			for phase, (calls, total, maximum) in phases:
+				lines.append("{:<40} {:>7} {:>11.3f} {:>10.3f} {:>10.3f}".format(phase, calls, total*1000, total*1000/calls, maximum*1000))
+			return "\n".join(lines)
+
+	class SensorHealth():
+		"""
+		Tracks the health of one sensor. Failed reads are retried with an exponential backoff,
+		values that deviate from the median of the recent samples by more than threshold times the
+		(scaled) median absolute deviation are rejected, unless they persist for maxRejections reads.
+		"""
+		def __init__(self, window = 10, threshold = 5, minDeviation = 5, maxRejections = 3, backoff = 1, maxBackoff = 300):
+			self.__samples = collections.deque(maxlen=window)
+			self.__threshold = threshold
+			self.__minDeviation = minDeviation
+			self.__maxRejections = maxRejections
+			self.__backoff = backoff
+			self.__maxBackoff = maxBackoff
+			self.__failures = 0
+			self.__rejections = 0
+			self.__retryAt = 0
+
+		def isBackingOff(self):
+			return time.monotonic() < self.__retryAt
+
+		def recordFailure(self):
+			self.__failures += 1
+			delay = min(self.__backoff * 2**(self.__failures-1), self.__maxBackoff)
+			self.__retryAt = time.monotonic() + delay
+			return delay
+
+		def isOutlier(self, value):
+			# needs a few samples before the median means anything
+			if len(self.__samples) < 3:
+				return False
+			median = statistics.median(self.__samples)
+			mad = statistics.median([abs(sample - median) for sample in self.__samples])
+			# 1.4826 scales the MAD to the standard deviation of normally distributed values
+			return abs(value - median) > max(1.4826*mad*self.__threshold, self.__minDeviation)
+
+		def reject(self):
+			"""
+			returns True if the value has to be dropped, False if outliers persisted long enough
+			to be a real change
+			"""
+			self.__rejections += 1
+			if self.__rejections < self.__maxRejections:
+				return True
+			self.__samples.clear()
+			return False
+
+		def accept(self, value):
+			self.__failures = 0
+			self.__rejections = 0
+			self.__retryAt = 0
+			self.__samples.append(value)
+
+		def getLastSample(self):
+			# the last accepted value, stands in for rejected outliers
+			if not self.__samples:
+				return None
+			return self.__samples[-1]
+
+		def getFailures(self):
+			return self.__failures
+
+		def getSnapshot(self):
+			return {
+				"failures" : self.__failures,
+				"rejections" : self.__rejections,
+				"backoff" : round(max(self.__retryAt - time.monotonic(), 0), 1)
+			}
+
+	class PwmAllocator():
+		"""
+		Spreads the rotation requested from several pwm fans across them, so the sum of the rotations
+		stays the same and the estimated noise or power is minimal. The cost of a fan is
+		(rot/maxRot)**exponent, except that every rotation above its loudThreshold costs loudPenalty
+		times as much: the marginal cost is multiplied, the cost up to the threshold stays the same.
+		The cost is convex, so the optimum has the same marginal cost on all fans that are not at
+		their bounds or on their loudThreshold. That marginal cost is found by bisection.
+		"""
+		exponents = {
+			# sound power grows with the fifth power of the rotation, electrical power with the third
+			"noise" : 5,
+			"power" : 3
+		}
+
+		def __init__(self, mode, loudPenalty = 4, iterations = 40):
+			if mode not in self.exponents:
+				raise ValueError("allocation has to be one of {}".format(", ".join(self.exponents.keys())))
+			self.__mode = mode
+			self.__exponent = self.exponents[mode]
+			self.__loudPenalty = loudPenalty
+			self.__iterations = iterations
+
+		def getMode(self):
+			return self.__mode
+
+		def __marginalCost(self, fan, rot):
+			exponent = self.__exponent
+			cost = exponent*rot**(exponent-1)/fan.getMaxRot()**exponent
+			if rot > fan.pwmToRot(fan.getLoudThreshold()):
+				cost *= self.__loudPenalty
+			return cost
+
+		def __rotAt(self, fan, marginalCost):
+			# inverse of the marginal cost, clamped to what the fan can do
+			exponent = self.__exponent
+			maxRot = fan.getMaxRot()
+			lowest = fan.pwmToRot(fan.getMinPwm())
+			loud = fan.pwmToRot(fan.getLoudThreshold())
+			rot = (marginalCost*maxRot**exponent/exponent)**(1/(exponent-1))
+			if rot > loud:
+				# stay on the loud threshold until the marginal cost pays for the penalty
+				rot = max((marginalCost*maxRot**exponent/(exponent*self.__loudPenalty))**(1/(exponent-1)), loud)
+			return min(max(rot, lowest), maxRot)
+
+		def allocate(self, fans, requestedRot):
+			"""
+			returns a dict mapping the fan names to their pwm values
+			"""
+			lower = 0
+			upper = max([self.__marginalCost(fan, fan.getMaxRot()) for fan in fans])
+			for iteration in range(self.__iterations):
+				middle = (lower + upper)/2
+				if sum([self.__rotAt(fan, middle) for fan in fans]) < requestedRot:
+					lower = middle
+				else:
+					upper = middle
+			allocation = {}
+			for fan in fans:
+				allocation[fan.getName()] = int(round(fan.rotToPwm(self.__rotAt(fan, upper))))
+			return allocation
+
 	class CounterWithNotifier():
 		def __init__(self, notificationObject, counter):
 			self.__counter = counter
@@ -76,14 +260,291 @@ class FanController():
 						self.__notificationObject.release()
 
 
+	class SysfsBackend():
+		"""
+		Reads and writes the hwmon files directly. Every backend implements beginTick(), flush(), close(), enable(),
+		writePwm(), readPwm(), writeRot(), readRot(), readTemperature() and readCriticalTemperature().
+		"""
+		def beginTick(self):
+			pass
+
+		def flush(self):
+			pass
+
+		def close(self):
+			pass
+
+		def enable(self, device, value):
+			with open(device + "_enable", "w") as f:
+				f.write(str(value))
+
+		def writePwm(self, device, pwm, name = None):
+			with open(device, "w") as f:
+				f.write(str(pwm))
+
+		def readPwm(self, device):
+			with open(device, "r") as f:
+				return int(f.readline().strip())
+
+		def writeRot(self, device, rot):
+			with open(device, "w") as f:
+				f.write(str(rot))
+
+		def readRot(self, device):
+			with open(device, "r") as f:
+				return int(f.readline().strip())
+
+		def readTemperature(self, device, divisor):
+			with open(device + "_input", "r") as f:
+				return int(f.readline().strip())/divisor
+
+		def readCriticalTemperature(self, device, divisor):
+			with open(device + "_crit") as f:
+				return int(f.readline(), 10)/divisor
+
+	class IpmiBackend():
+		"""
+		Fans and sensors behind a BMC. The device of a sensor is its name in the SDR, the device of a fan
+		is its zone. All sensors are read with one "sdr" command per tick and the pwm values of a tick are
+		sent as one raw command per zone, the highest value of the fans in a zone wins. The commands go
+		through a persistent "ipmitool shell" session, if that can't be started ipmitool is run for every command.
+		rawCommand is formatted with zone, duty (percent) and pwm as hex bytes, the default is the
+		Supermicro one.
+		"""
+		prompt = b'ipmitool> '
+		# the shell has no exit status, failed commands are recognized by what ipmitool prints
+		errorPrefixes = ("Unable to", "Error", "Invalid", "Could not", "Failed", "Usage")
+
+		def __init__(self, name, ipmitool = "/usr/bin/ipmitool", arguments = [], rawCommand = "0x30 0x70 0x66 0x01 {zone} {duty}",
+			enableCommand = None, shell = True, timeout = 10):
+			self.__name = name
+			self.__ipmitool = ipmitool
+			self.__arguments = [ str(argument) for argument in arguments ]
+			self.__rawCommand = rawCommand
+			self.__enableCommand = enableCommand
+			self.__useShell = shell
+			self.__timeout = timeout
+			self.__shell = None
+			# zone -> { fan name -> pwm }
+			self.__requestedPwm = {}
+			# zone -> pwm
+			self.__sentPwm = {}
+			self.__readings = {}
+			self.__stale = True
+			self.__enabled = False
+			# __lock protects the readings and pwm values and is never held while ipmitool runs,
+			# __refreshLock makes sure only one thread reads the sdr, __shellLock protects the ipmitool session
+			self.__lock = threading.Lock()
+			self.__refreshLock = threading.Lock()
+			self.__shellLock = threading.Lock()
+			self.__logging = logging.getLogger("IPMI-{}".format(name))
+
+		def getName(self):
+			return self.__name
+
+		def __startShell(self):
+			self.__logging.debug("Starting ipmitool shell")
+			self.__shell = subprocess.Popen([self.__ipmitool] + self.__arguments + ["shell"], stdin=subprocess.PIPE,
+				stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=0)
+			self.__readUntilPrompt()
+
+		def __stopShell(self):
+			if self.__shell != None:
+				self.__shell.kill()
+				self.__shell.wait()
+				self.__shell.stdin.close()
+				self.__shell.stdout.close()
+				self.__shell = None
+
+		def close(self):
+			with self.__shellLock:
+				self.__stopShell()
+
+		def __readUntilPrompt(self):
+			output = b''
+			deadline = time.monotonic() + self.__timeout
+			fd = self.__shell.stdout.fileno()
+			pollingObject = select.poll()
+			pollingObject.register(fd, select.POLLIN)
+			while not output.endswith(self.prompt):
+				remaining = deadline - time.monotonic()
+				if remaining <= 0:
+					raise TimeoutError("ipmitool shell did not answer within {} seconds".format(self.__timeout))
+				if not pollingObject.poll(remaining*1000):
+					continue
+				data = os.read(fd, 65536)
+				if not data:
+					raise EOFError("ipmitool shell exited")
+				output += data
+			return output[:-len(self.prompt)].decode("utf-8", "replace")
+
+		def __execute(self, command):
+			with self.__shellLock, FanController.timings.measure("ipmitool {}".format(command.split()[0])):
+				if self.__useShell and self.__shell == None:
+					try:
+						self.__startShell()
+					except FileNotFoundError:
+						raise
+					except Exception as e:
+						self.__logging.warning("Could not start the ipmitool shell, running ipmitool for every command: {}".format(e))
+						self.__stopShell()
+						self.__useShell = False
+				if self.__shell != None:
+					output = None
+					try:
+						self.__shell.stdin.write(command.encode("utf-8") + b'\n')
+						output = self.__readUntilPrompt()
+					except Exception as e:
+						# the session is restarted with the next command
+						self.__logging.warning("ipmitool shell failed, running ipmitool directly: {}".format(e))
+						self.__stopShell()
+					if output != None:
+						errors = [ line.strip() for line in output.splitlines() if line.strip().startswith(self.errorPrefixes) ]
+						if errors:
+							raise RuntimeError("ipmitool {} failed: {}".format(command, " ".join(errors)))
+						return output
+				proc = subprocess.run([self.__ipmitool] + self.__arguments + command.split(), stdout=subprocess.PIPE,
+					stderr=subprocess.PIPE, timeout=self.__timeout)
+				if proc.returncode != 0:
+					raise RuntimeError("ipmitool {} failed: {}".format(command, proc.stderr.decode("utf-8", "replace").strip()))
+				return proc.stdout.decode("utf-8", "replace")
+
+		def __refresh(self):
+			# one sdr command per tick, all sensors are served from its output
+			self.__stale = False
+			readings = {}
+			try:
+				output = self.__execute("sdr")
+			except Exception as e:
+				self.__logging.error("Could not read the sdr: {}".format(e))
+				output = ""
+			for line in output.splitlines():
+				fields = [ field.strip() for field in line.split("|") ]
+				if len(fields) < 2 or not fields[0]:
+					continue
+				value = fields[1].split(" ")[0]
+				try:
+					readings[fields[0]] = float(value)
+				except ValueError:
+					readings[fields[0]] = None
+			with self.__lock:
+				self.__readings = readings
+
+		def beginTick(self):
+			self.__stale = True
+
+		def __byte(self, value):
+			return "0x{:02x}".format(int(value))
+
+		def flush(self):
+			with self.__lock:
+				changed = {}
+				for zone, requested in self.__requestedPwm.items():
+					pwm = max(requested.values())
+					if self.__sentPwm.get(zone) != pwm:
+						changed[zone] = pwm
+						# set before sending, so a flush from another thread doesn't send it again
+						self.__sentPwm[zone] = pwm
+			for zone, pwm in changed.items():
+				command = "raw " + self.__rawCommand.format(zone=self.__byte(zone), duty=self.__byte(round(pwm*100/255)),
+					pwm=self.__byte(pwm))
+				self.__logging.debug("Setting pwm value {} on zone {}".format(pwm, zone))
+				try:
+					self.__execute(command)
+				except Exception as e:
+					self.__logging.error("Could not set zone {}: {}".format(zone, e))
+					with self.__lock:
+						self.__sentPwm.pop(zone, None)
+
+		def enable(self, device, value):
+			# the BMC only has to be switched to manual control once
+			if self.__enableCommand != None and not self.__enabled:
+				self.__execute("raw " + self.__enableCommand)
+				self.__enabled = True
+
+		def writePwm(self, device, pwm, name = None):
+			with self.__lock:
+				self.__requestedPwm.setdefault(device, {})[name] = int(pwm)
+
+		def readPwm(self, device):
+			# the BMC can't be asked, so this is the last requested value or full speed if there is none
+			with self.__lock:
+				if device in self.__requestedPwm:
+					return max(self.__requestedPwm[device].values())
+			return 255
+
+		def writeRot(self, device, rot):
+			raise ValueError("IPMI fans have to be pwm controlled")
+
+		def readRot(self, device):
+			with self.__refreshLock:
+				if self.__stale:
+					self.__refresh()
+			with self.__lock:
+				return self.__readings.get(device)
+
+		def readTemperature(self, device, divisor):
+			return self.readRot(device)
+
+		def readCriticalTemperature(self, device, divisor):
+			return None
+
+	class DryRunBackend():
+		"""
+		Wraps another backend for --profile. Reads go to the hardware, writes are only logged.
+		"""
+		def __init__(self, backend):
+			self.__backend = backend
+			self.__pwm = {}
+			self.__logging = logging.getLogger("DryRun")
+
+		def beginTick(self):
+			self.__backend.beginTick()
+
+		def flush(self):
+			pass
+
+		def close(self):
+			self.__backend.close()
+
+		def enable(self, device, value):
+			self.__logging.debug("Not enabling {} on {}".format(value, device))
+
+		def writePwm(self, device, pwm, name = None):
+			self.__logging.debug("Not setting pwm value {} on {}".format(pwm, device))
+			self.__pwm[device] = pwm
+
+		def readPwm(self, device):
+			if device in self.__pwm:
+				return self.__pwm[device]
+			return self.__backend.readPwm(device)
+
+		def writeRot(self, device, rot):
+			self.__logging.debug("Not setting rot value {} on {}".format(rot, device))
+
+		def readRot(self, device):
+			return self.__backend.readRot(device)
+
+		def readTemperature(self, device, divisor):
+			return self.__backend.readTemperature(device, divisor)
+
+		def readCriticalTemperature(self, device, divisor):
+			return self.__backend.readCriticalTemperature(device, divisor)
+
 	class Fan():
-		def __init__(self, device, name = None, pwm = False, enable = 1, loudThreshold = 180, maxRot = 1500, minPwm = 80):
+		def __init__(self, device, name = None, pwm = False, enable = 1, loudThreshold = 180, maxRot = 1500, minPwm = 80, slewRate = 25, loudSlewRate = None,
+			backend = None, rotInput = None):
 			if name == None:
 				self.__name = os.path.basename(device)
 			else:
 				self.__name = name
 			self.__device = device
+			if backend == None:
+				backend = FanController.SysfsBackend()
+			self.__backend = backend
 			self.__isPwm = pwm
+			# the tachometer of a pwm fan, e.g. /sys/class/hwmon/hwmon2/device/fan1_input or a sdr name
+			self.__rotInput = rotInput
 			self.__minPwm = minPwm
 			self.__logging = logging.getLogger(name)
 			# enable tells if the fan is controlled by the micro controller or the software. They're mutually exclusive.
@@ -91,14 +552,35 @@ class FanController():
 			self.__setEnable()
 			self.__loudThreshold = loudThreshold
 			self.__maxRot = maxRot
+			self.__lastPwm = None
+			# slewRate and loudSlewRate are in pwm steps per second, the latter is used above loudThreshold.
+			# A slewRate of 0 disables ramping.
+			self.__slewRate = slewRate
+			if loudSlewRate == None:
+				self.__loudSlewRate = slewRate/3
+			else:
+				self.__loudSlewRate = loudSlewRate
+			# the actuator ramps __rampPwm towards __targetPwm, once it is attached. __targetPwm is the override,
+			# if there is one, __requestedPwm always is the value the controller asked for
+			self.__ramping = False
+			self.__requestedPwm = None
+			self.__targetPwm = None
+			self.__rampPwm = None
+			self.__writeLock = threading.Lock()
+			# a temporary pwm value set through the control socket, it wins over the controllers until it expires
+			self.__overridePwm = None
+			self.__overrideUntil = 0
+			self.__overrideLock = threading.Lock()
 
 		def __repr__(self):
 			return "device {} name {} pwm {} enable {} loudThreshold {} maxRot {}".format(self.__device, self.__name, self.__isPwm, self.__enable,
 				self.__loudThreshold, self.__maxRot)
 
 		def __setEnable(self):
-			with open(self.__generateControlFilePath() + "_enable", "w") as f:
-				f.write(str(self.__enable))
+			self.__backend.enable(self.__generateControlFilePath(), self.__enable)
+
+		def getBackend(self):
+			return self.__backend
 
 		def isControlled(self):
 			return self.__enable == 2
@@ -106,10 +588,112 @@ class FanController():
 		def isPwm(self):
 			return self.__isPwm
 
-		def setPwm(self, pwm):
+		def setPwm(self, pwm, ignoreOverride = False, immediate = False):
+			"""
+			Sets the requested pwm value. An active override is applied instead, unless ignoreOverride is set.
+			The value is written right away if immediate is set or ramping is disabled, otherwise the actuator
+			ramps the fan towards it.
+			"""
+			self.__requestedPwm = pwm
+			if not ignoreOverride and self.hasOverride():
+				pwm = self.__overridePwm
+			self.__applyPwm(pwm, immediate)
+
+		def __applyPwm(self, pwm, immediate = False):
+			with self.__writeLock:
+				self.__targetPwm = pwm
+				if immediate or not self.__ramping or self.__rampPwm == None:
+					self.__rampPwm = pwm
+					self.__writePwm(pwm)
+					if immediate:
+						self.__backend.flush()
+				else:
+					self.__logging.debug("Ramping {} towards pwm value {}".format(self.getName(), pwm))
+
+		def __writePwm(self, pwm):
 			self.__logging.debug("Setting pwm value {} on {}".format(pwm, self.__generateControlFilePath()))
-			with open(self.__generateControlFilePath(), "w") as f:
-				f.write(str(pwm))
+			with FanController.timings.measure("write {}".format(self.getName())):
+				self.__backend.writePwm(self.__generateControlFilePath(), pwm, self.getName())
+			self.__lastPwm = pwm
+
+		def enableRamping(self):
+			self.__ramping = self.isPwm() and self.__slewRate > 0
+			return self.__ramping
+
+		def ramp(self, elapsed):
+			"""
+			Moves the pwm value towards the target by the slew rate, called by the actuator
+			"""
+			with self.__writeLock:
+				if self.__targetPwm == None or self.__rampPwm == None or self.__rampPwm == self.__targetPwm:
+					return
+				if self.__rampPwm >= self.__loudThreshold:
+					step = self.__loudSlewRate*elapsed
+				else:
+					step = self.__slewRate*elapsed
+				if self.__targetPwm > self.__rampPwm:
+					self.__rampPwm = min(self.__rampPwm + step, self.__targetPwm)
+				else:
+					self.__rampPwm = max(self.__rampPwm - step, self.__targetPwm)
+				pwm = int(round(self.__rampPwm))
+				# only touch the hardware if the written value changes
+				if pwm != self.__lastPwm:
+					self.__writePwm(pwm)
+
+		def getTargetPwm(self):
+			# the value the controller asked for, an override doesn't change it
+			if self.__requestedPwm == None:
+				return self.getPwm()
+			return self.__requestedPwm
+
+		def getLastPwm(self):
+			# the last value written, so callers don't have to touch the hardware
+			return self.__lastPwm
+
+		def setOverride(self, pwm, duration):
+			self.__logging.info("Overriding pwm with {} for {} seconds".format(pwm, duration))
+			with self.__overrideLock:
+				self.__overridePwm = pwm
+				self.__overrideUntil = time.monotonic() + duration
+			self.__applyPwm(pwm)
+
+		def clearOverride(self, expired = False):
+			"""
+			Ends the override and goes back to the value the controller asked for
+			"""
+			with self.__overrideLock:
+				overridePwm = self.__overridePwm
+				if overridePwm == None or (expired and time.monotonic() < self.__overrideUntil):
+					return
+				self.__overridePwm = None
+				self.__overrideUntil = 0
+			if expired:
+				self.__logging.info("Override of {} expired".format(overridePwm))
+			else:
+				self.__logging.info("Override cleared")
+			if self.__requestedPwm != None:
+				self.__applyPwm(self.__requestedPwm)
+
+		def hasOverride(self):
+			# called every tick by Main, so an expired override is undone even if nobody sets the fan
+			if self.__overridePwm != None and time.monotonic() >= self.__overrideUntil:
+				self.clearOverride(expired=True)
+			return self.__overridePwm != None
+
+		def getSnapshot(self):
+			snapshot = {
+				"pwm" : self.__lastPwm,
+				"requested" : self.__requestedPwm,
+				"target" : self.__targetPwm,
+				"maxRot" : self.__maxRot,
+				"override" : None
+			}
+			if self.hasOverride():
+				snapshot["override"] = {
+					"pwm" : self.__overridePwm,
+					"remaining" : round(self.__overrideUntil - time.monotonic(), 1)
+				}
+			return snapshot
 
 		def __generatePathPrefix(self):
 			return self.__device
@@ -127,14 +711,19 @@ class FanController():
 			return (rot/self.__maxRot)*255
 
 		def readRot(self):
-			with open(self.__generateControlFilePath(), "r") as f:
-				if self.isPwm():
-					return self.pwmToRot(int(f.readline().strip()))
-				else:
-					return int(f.readline().strip())
+			if self.__rotInput != None:
+				return self.__backend.readRot(self.__rotInput)
+			elif self.isPwm():
+				return self.pwmToRot(self.__backend.readPwm(self.__generateControlFilePath()))
+			else:
+				return self.__backend.readRot(self.__generateControlFilePath())
+
+		def canDetectMaxRot(self):
+			# without a tachometer readRot only converts the pwm value back
+			return self.isPwm() and self.__rotInput != None
+
 		def getPwm(self):
-			with open(self.__generateControlFilePath(), "r") as f:
-				return int(f.readline().strip())
+			return self.__backend.readPwm(self.__generateControlFilePath())
 
 		def readRotAlreadyOpen(self, fanRotStream):
 			fanRotStream.seek(0,0)
@@ -142,36 +731,34 @@ class FanController():
 		
 		def setRot(self, rot):
 			self.__logging.debug("Setting rot value {} on {}".format(rot, self.getName()))
-			with open(self.__generateControlFilePath(), "w") as f:
-				f.write(rot)
+			self.__backend.writeRot(self.__generateControlFilePath(), rot)
 
-		def detectMaxRot(self, fan):
+		def detectMaxRot(self):
 			"""
 			This method spins up the particular fan to max speed and returns it, after fluctuations receeded
 			"""
+			if not self.canDetectMaxRot():
+				raise ValueError("{} needs to be pwm controlled and have a rotInput".format(self.getName()))
 			maxRot = 0
-			# the time the function waits for fluctuations , after the 
+			# the number of seconds without a new maximum, after which the speed is considered stable
 			waitPeriod = 10
 			waitedPeriod = 0
-			waited = 0
 			self.__logging.info("Detecting maximum fan speed")
-			with open(fan, "w") as f:
-				f.write("255")
+			self.setPwm(255, ignoreOverride=True, immediate=True)
 
-			while True:
-				rot = self.readRot(fan)
-				if rot > maxRot:
+			while waitedPeriod < waitPeriod:
+				time.sleep(1)
+				rot = self.readRot()
+				if rot != None and rot > maxRot:
 					maxRot = rot
-				if waited == 1:
-					waited = 0
+					waitedPeriod = 0
+				else:
 					waitedPeriod += 1
-					if waitedPeriod >= waitPeriod:
-						self.__maxRot =  maxRot
-						self.__logging.info("Detected maximum fan speed of {}".format(maxRot))
-						return
-				if not rot > maxRot:
-					waited = 1
-				time.sleep(1)
+			if maxRot <= 0:
+				raise ValueError("{} did not report a rotation".format(self.getName()))
+			self.__maxRot = maxRot
+			self.__logging.info("Detected maximum fan speed of {}".format(maxRot))
+			return maxRot
 
 		def getLoudThreshold(self):
 			return self.__loudThreshold
@@ -196,12 +783,15 @@ class FanController():
 
 	class TemperatureSensor():
 		def __init__(self, device, divisor = 10000, name = None, beep = False, crit_beep = False, crit = 90, smart = False, tempId = 194,
-			min = 20, max = 40, logLevel=logging.INFO):
+			min = 20, max = 40, outlierWindow = 10, outlierThreshold = 5, maxBackoff = 300, backend = None, logLevel=logging.INFO):
 			if name == None:
 				self.__name = os.path.basename(prefixPath)
 			else:
 				self.__name = name
 			self.__device = device
+			if backend == None:
+				backend = FanController.SysfsBackend()
+			self.__backend = backend
 			self.__divisor = divisor
 			self.__beep = beep
 			self.__crit = crit
@@ -211,6 +801,10 @@ class FanController():
 			self.__max = max
 			self.__name = name
 			self.__logLevel = logLevel
+			self.__lastTemperature = None
+			self.__health = FanController.SensorHealth(window=outlierWindow, threshold=outlierThreshold, maxBackoff=maxBackoff)
+			# the sensor can be shared by several controllers running in parallel
+			self.__lock = threading.Lock()
 			if self.__smart:
 				self.__logging = logging.getLogger("HDD-{}".format(name))
 			else:
@@ -224,16 +818,58 @@ class FanController():
 			with open(self.__generateSensorPath()) + "_alarm" as f:
 				return bool(int(f.readline()))
 		def isCritical(self):
-			temp = self.getTemperature()
+			# uses the value of the last read, a failed sensor is handled by the controller
+			temp = self.getLastTemperature()
 			if temp != None:
 				return temp > self.getCriticalTemperature() 
-			return True
+			return False
 			
 		def getCriticalTemperature(self):
-			with open(self.__generateSensorPath() + "_crit") as f:
-				return int(f.readline(), 10)/self.__divisor
+			if self.__smart:
+				return self.__crit
+			try:
+				critical = self.__backend.readCriticalTemperature(self.__generateSensorPath(), self.__divisor)
+			except (OSError, ValueError):
+				critical = None
+			if critical == None:
+				return self.__crit
+			return critical
 
 		def getTemperature(self):
+			"""
+			returns the temperature or None, if the sensor failed, is backing off after failures
+			or the value was rejected as an outlier
+			"""
+			with self.__lock:
+				self.__lastTemperature = self.__filterTemperature()
+				return self.__lastTemperature
+
+		def __filterTemperature(self):
+			if self.__health.isBackingOff():
+				self.__logging.debug("Skipping read, backing off after {} failures".format(self.__health.getFailures()))
+				return None
+			with FanController.timings.measure("read {}".format(self.getName())):
+				temp = self.__readTemperature()
+			if temp == None:
+				delay = self.__health.recordFailure()
+				self.__logging.warning("Read failed {} times, retrying in {} seconds".format(self.__health.getFailures(), delay))
+				return None
+			# never hold back critical values
+			if self.__health.isOutlier(temp) and temp <= self.getCriticalTemperature() and self.__health.reject():
+				# an outlier isn't a failure, the sensor is still up
+				self.__logging.warning("Rejected outlier {}, using {}".format(temp, self.__health.getLastSample()))
+				return self.__health.getLastSample()
+			self.__health.accept(temp)
+			return temp
+
+		def getHealthSnapshot(self):
+			return self.__health.getSnapshot()
+
+		def getLastTemperature(self):
+			# the value of the last read, so callers don't have to touch the hardware
+			return self.__lastTemperature
+
+		def __readTemperature(self):
 			self.__logging.debug("Getting temperature from {}".format(self.getName()))
 			if self.__smart:
 				"""
@@ -241,7 +877,8 @@ class FanController():
 				returns temperature in degrees celsius (°C) or None, if it failed
 				"""
 				try:
-					proc = subprocess.run(["/usr/bin/smartctl" , "-a", "{}".format(self.__device)], stdout=subprocess.PIPE)
+					with FanController.timings.measure("smartctl {}".format(self.getName())):
+						proc = subprocess.run(["/usr/bin/smartctl" , "-a", "{}".format(self.__device)], stdout=subprocess.PIPE)
 					lines = proc.stdout.splitlines()
 					for line in lines:
 						if b'Temperature_Celsius' in line:
@@ -268,8 +905,7 @@ class FanController():
 					return None
 			else:
 				try:
-					with open(self.__generateSensorPath() + "_input", "r") as f:
-						return int(f.readline().strip())/self.__divisor
+					return self.__backend.readTemperature(self.__generateSensorPath(), self.__divisor)
 				except Exception as e:
 					self.__logging.error("Failed to get temperatue value: {}".format(traceback.format_exc()))
 					return None	
@@ -325,7 +961,7 @@ class FanController():
 		@arg tempStop int is the temperature at which the fans are stopped.
 			if it is zero, it is disabled.
 		"""
-		def __init__(self, name, verbosityLevel = logging.INFO, inputs=[], outputs=[], envTemp = None, maxTemp=90, timeDuration = 5, tempStop=40, fluctuationThreshold = 5):
+		def __init__(self, name, verbosityLevel = logging.INFO, inputs=[], outputs=[], envTemp = None, maxTemp=90, timeDuration = 5, tempStop=40, fluctuationThreshold = 5, allocation = None):
 			self.__name = name
 			self.__logging = logging.getLogger("Controller-{}".format(name))
 			self.__logging.setLevel(verbosityLevel)
@@ -335,6 +971,16 @@ class FanController():
 			self.__tempStop = tempStop
 			self.__envTemp = envTemp
 			self.__fluctuationThreshold = fluctuationThreshold
+			self.__lastWeightedTemperature = None
+			self.__paused = False
+			self.__calibrating = False
+			# with an allocation mode, the pwm values requested in a tick are collected and spread across the fans
+			self.__allocator = None
+			if allocation != None:
+				self.__allocator = FanController.PwmAllocator(allocation)
+			self.__requestedPwm = {}
+			# the pwm values from before __setMaximum, None if the controller isn't failing safe
+			self.__failSafePwm = None
 
 			success = True
 			for sensor in inputs:
@@ -358,23 +1004,89 @@ class FanController():
 			self.__ringBuffer = FanController.RingBuffer(timeDuration)
 
 		def iterate(self):
+			if self.__calibrating:
+				self.__logging.debug("Skipping iteration, calibrating")
+				return
 			try:
-				self.__ringBuffer += self.getWeightedTemperature()
+				temperature = self.getWeightedTemperature()
+				if temperature == None:
+					self.__logging.error("No input delivered a temperature, setting fans to maximum")
+					self.__setMaximum()
+					return
+				self.__ringBuffer += temperature
 				for sensorName, sensor in self.__inputs.items():
 					if sensor.isCritical():
-						self.__logging.warn("Sensor {} is critical at {}".format(sensorName, sensor.getTemperature()))
+						self.__logging.warning("Sensor {} is critical at {}".format(sensorName, sensor.getLastTemperature()))
 						self.__setMaximum()
 						return
-				self.actOnTempChanged()
-			except:
-				pass
+				if self.__failSafePwm != None:
+					self.__recover(temperature)
+					return
+				# a paused controller still fails safe, it only leaves the fans alone otherwise
+				if self.__paused:
+					self.__logging.debug("Skipping the adjustment, paused")
+					return
+				with FanController.timings.measure("curve {}".format(self.__name)):
+					self.actOnTempChanged()
+				with FanController.timings.measure("allocation {}".format(self.__name)):
+					self.__allocate()
+			except Exception as e:
+				self.__logging.error("Iteration failed, setting fans to maximum: {}".format(traceback.format_exc()))
+				self.__setMaximum()
+
+		def __setFanPwm(self, fan, pwm):
+			if self.__allocator != None and fan.isPwm() and not fan.hasOverride():
+				self.__requestedPwm[fan.getName()] = min(max(pwm, 0), 255)
+			else:
+				fan.setPwm(pwm)
+
+		def __allocate(self):
+			if not self.__requestedPwm:
+				return
+			fans = [ self.__outputs[name] for name in self.__requestedPwm.keys() ]
+			requestedRot = sum([ fan.pwmToRot(self.__requestedPwm[fan.getName()]) for fan in fans ])
+			allocation = self.__allocator.allocate(fans, requestedRot)
+			self.__logging.debug("Allocated {} for requested {}".format(allocation, self.__requestedPwm))
+			self.__requestedPwm.clear()
+			for name, pwm in allocation.items():
+				self.__outputs[name].setPwm(pwm)
+
+		def __recover(self, temperature):
+			"""
+			Sets the outputs back after __setMaximum. Fans with a curve follow it, the others get
+			the pwm value they had before.
+			"""
+			self.__logging.info("Inputs recovered at {}, re-evaluating the outputs".format(temperature))
+			failSafePwm = self.__failSafePwm
+			self.__failSafePwm = None
+			for name, fan in self.__outputs.items():
+				if type(fan) == FanController.ControlledFan:
+					self.followCurve(fan)
+				elif failSafePwm.get(name) != None:
+					self.__setFanPwm(fan, failSafePwm[name])
+			self.__setLastEffectiveTemperatureChange(temperature)
+			self.__allocate()
 
 		def __setMaximum(self):
+			# never raises, a fan that can't be written must not keep the others from going to maximum
+			self.__requestedPwm.clear()
+			if self.__failSafePwm == None:
+				self.__failSafePwm = {}
+				for name, fan in self.__outputs.items():
+					try:
+						if fan.isPwm():
+							self.__failSafePwm[name] = fan.getTargetPwm()
+					except Exception as e:
+						self.__logging.error("Could not get the pwm value of {}: {}".format(name, e))
 			for fan in self.__outputs.values():
-				if fan.isPwm():
-					fan.setPwm(255)
-				else:
-					fan.setRot(fan.getMaxRot())
+				try:
+					if fan.isPwm():
+						# critical, don't wait for the ramp
+						fan.setPwm(255, ignoreOverride=True, immediate=True)
+					else:
+						fan.setRot(fan.getMaxRot())
+				except Exception as e:
+					self.__logging.error("Could not set {} to maximum: {}".format(fan.getName(), traceback.format_exc()))
 
 		def __increaseFanSpeed(self, value=5):
 			# increase the speed of all fans by value percent (if not pwm) or value/255 (if it is pwm).
@@ -384,14 +1096,14 @@ class FanController():
 					self.followCurve(fan)
 				else:
 					if fan.isPwm():
-						pwmValue = fan.getPwm()
+						pwmValue = fan.getTargetPwm()
 						newValue = int(pwmValue + value)
 						if newValue > 255:
 							self.__logging.debug("Setting pwm value {} on {}".format(255, fan.getName()))
-							fan.setPwm(255)
+							self.__setFanPwm(fan, 255)
 						else:
 							self.__logging.debug("Setting pwm value {} on {}".format(newValue, fan.getName()))
-							fan.setPwm(newValue)
+							self.__setFanPwm(fan, newValue)
 					else:
 						rotValue = fan.getRot()
 						newValue = int(rotValue + fan.getMaxRot()*0.05)
@@ -406,15 +1118,15 @@ class FanController():
 			# increase the speed of all fans by value percent (if not pwm) or value/255 (if it is pwm).
 			for name, fan in self.__outputs.items():
 				if fan.isPwm():
-					pwmValue = fan.getPwm()
+					pwmValue = fan.getTargetPwm()
 					newValue = pwmValue - value
 					if newValue < fan.getMinPwm():
 						newPwm = fan.getMinPwm()
 						self.__logging.debug("Setting pwm value {} on {}".format(newPwm, fan.getName()))
-						fan.setPwm(fan.getMinPwm())
+						self.__setFanPwm(fan, fan.getMinPwm())
 					else:
 						self.__logging.debug("Setting pwm value {} on {}".format(newValue, fan.getName()))
-						fan.setPwm(newValue)
+						self.__setFanPwm(fan, newValue)
 				else:
 					rotValue = fan.getRot()
 					newValue = rotValue - fan.getMaxRot()*0.05
@@ -441,8 +1153,8 @@ class FanController():
 			try:
 				# the function checks if the temperature fluctuated more than a certain threshold since the last fan speed change
 				oldWeightedTemperature = self.__ringBuffer.getValue()
-				newWeightedTemperature = self.getWeightedTemperature()
-				self.__ringBuffer += newWeightedTemperature
+				# iterate() already read the inputs for this tick
+				newWeightedTemperature = self.__lastWeightedTemperature
 				if self.__getLastEffectiveTemperatureChange() - newWeightedTemperature > self.__getFluctuationThreshold():
 					self.__increaseFanSpeed()
 					self.__setLastEffectiveTemperatureChange(newWeightedTemperature)
@@ -453,18 +1165,29 @@ class FanController():
 				self.__logging.error("Could not change fan speed due to exception {}".format(traceback.format_exc()))
 
 		def getWeightedTemperature(self):
-			sumTotal = 0
+			"""
+			Inputs without a temperature are left out and the remaining ones reweighted.
+			returns None if no input delivered a temperature
+			"""
 			sumOfWeights = 0
 			sumOfTemps = 0
-			for inputDevice in self.__inputs.values():
+			failed = []
+			for inputName, inputDevice in self.__inputs.items():
 				weight = inputDevice.getWeight()
 				temp = inputDevice.getTemperature()
 				self.__logging.debug("Calculating with temp {} and weight {}".format(temp, weight))
 				if temp != None:
 					sumOfWeights += weight
 					sumOfTemps += temp*weight
+				else:
+					failed.append(inputName)
+			result = None
+			if sumOfWeights > 0:
 				result = sumOfTemps/sumOfWeights
 				self.__logging.debug("Calculated weighted temperature of {}".format(result))
+			if failed:
+				self.__logging.warning("Running degraded without inputs {}".format(", ".join(failed)))
+			self.__lastWeightedTemperature = result
 			return result
 
 		def anyInputCritical(self):
@@ -478,18 +1201,68 @@ class FanController():
 				fans.setPwm(pwm)
 
 		def detectMaxRots(self):
-			def checkRot(fan, counterObject):
-				fan.detectMaxRot()
-				counterObject.decrease()
+			def detect(fan):
+				try:
+					fan.detectMaxRot()
+				except Exception as e:
+					errors.append("{}: {}".format(fan.getName(), e))
 
 			threads = []
-			notifier = threading.Condition()
-			value = FanControl.CounterWithNotifier(notifier, len(self.__fans))
-			for fan in self.__fans:
-				threads.append(threading.Thread(target=checkRot, args=(value)))
-			notifier.acquire()
-			notifier.wait()
-			notifier.release()
+			errors = []
+			for fan in self.__outputs.values():
+				newThread = threading.Thread(target=detect, args=(fan,))
+				newThread.start()
+				threads.append(newThread)
+			for thread in threads:
+				thread.join()
+			if errors:
+				raise ValueError("detecting the maximum speed failed for {}".format(", ".join(errors)))
+
+		def calibrate(self):
+			# runs detectMaxRots in the background, iterate() does nothing until it is done
+			if self.__calibrating:
+				return False
+			missing = [ name for name, fan in self.__outputs.items() if not fan.canDetectMaxRot() ]
+			if missing:
+				raise ValueError("can't calibrate {}, only pwm fans with a rotInput can be".format(", ".join(missing)))
+			self.__calibrating = True
+			threading.Thread(target=self.__calibrate).start()
+			return True
+
+		def __calibrate(self):
+			self.__logging.info("Calibrating outputs")
+			try:
+				self.detectMaxRots()
+				self.__logging.info("Calibration finished")
+			except Exception as e:
+				self.__logging.error("Calibration failed: {}".format(traceback.format_exc()))
+			finally:
+				self.__calibrating = False
+
+		def isCalibrating(self):
+			return self.__calibrating
+
+		def pause(self):
+			self.__logging.info("Paused")
+			self.__paused = True
+
+		def resume(self):
+			self.__logging.info("Resumed")
+			self.__paused = False
+
+		def isPaused(self):
+			return self.__paused
+
+		def getSnapshot(self):
+			# only uses the values of the last iteration, nothing is read from the hardware
+			return {
+				"temperature" : self.__lastWeightedTemperature,
+				"paused" : self.__paused,
+				"calibrating" : self.__calibrating,
+				"allocation" : self.__allocator.getMode() if self.__allocator != None else None,
+				"inputs" : list(self.__inputs.keys()),
+				"outputs" : list(self.__outputs.keys())
+			}
 
 		def getName(self):
 			return self.__name
@@ -503,7 +1276,7 @@ class FanController():
 				return int(pwm)
 
 			# follow the curve points and scale the outputs correspondingly
-			temp = self.getWeightedTemperature()
+			temp = self.__lastWeightedTemperature
 			# figure out between which points this is 
 			points = fan.getPoints()
 			pointLen = len(points)
@@ -512,7 +1285,7 @@ class FanController():
 				nextPoint = points[index+1]
 				if temp > thisPoint.getTemp() and temp < nextPoint.getTemp():
 					# the temperature is between the two curve points, now scale the pwm output according to the temperature
-					fan.setPwm(scale(temp, thisPoint, nextPoint))
+					self.__setFanPwm(fan, scale(temp, thisPoint, nextPoint))
 					return
 			# get the last point, then scale to pwm value 255 with far temp point being the lowest critical temperature of all sensors
 			lastPoint = points[-1]
@@ -525,7 +1298,7 @@ class FanController():
 					lowestCrit = criticalTemperature
 
 			pseudoPoint = FanController.CurvePoint(lowestCrit, 255)
-			fan.setPwm(scale(temp, lastPoint, pseudoPoint))
+			self.__setFanPwm(fan, scale(temp, lastPoint, pseudoPoint))
 			return 
 
 	class Main():
@@ -533,33 +1306,204 @@ class FanController():
 			def __init__(self, sock, interval):
 				self.socket = sock
 				self.interval = interval
+				self.__stopEvent = threading.Event()
 				self.__logging = logging.getLogger("Waker")
 				self.__logging.setLevel(logging.DEBUG)
 
 			def Main(self):
 				self.__logging.debug("Entered Main function")
-				while True:
+				while not self.__stopEvent.is_set():
 					self.socket.sendall(b'a')
-					time.sleep(self.interval)
+					self.__stopEvent.wait(self.interval)
+
+			def stop(self):
+				self.__stopEvent.set()
+
+		class Actuator():
+			"""
+			Ramps the fans towards the pwm values set by the controllers, at a higher frequency than the control loop
+			"""
+			def __init__(self, fans, interval):
+				self.fans = fans
+				self.interval = interval
+				self.backends = set([ fan.getBackend() for fan in fans ])
+				self.__stopEvent = threading.Event()
+				self.__logging = logging.getLogger("Actuator")
+
+			def Main(self):
+				self.__logging.debug("Entered Main function")
+				lastTime = time.monotonic()
+				while not self.__stopEvent.wait(self.interval):
+					now = time.monotonic()
+					for fan in self.fans:
+						try:
+							fan.ramp(now - lastTime)
+						except Exception as e:
+							self.__logging.error("Could not ramp {}: {}".format(fan.getName(), traceback.format_exc()))
+					for backend in self.backends:
+						backend.flush()
+					lastTime = now
+
+			def stop(self):
+				self.__stopEvent.set()
+
+		class ControlServer():
+			"""
+			Unix domain socket for live queries and temporary overrides. Requests and responses are
+			one JSON object per line, e.g. {"command": "get"} is answered with {"ok": true, "result": {...}}.
+			Commands:
+				get
+				override fan pwm duration (pwm null clears the override)
+				pause controller
+				resume controller
+				calibrate controller
+			"""
+			maxRequestSize = 65536
+
+			def __init__(self, path, main):
+				self.__path = path
+				self.__main = main
+				self.__socket = None
+				# fd -> [socket, buffer]
+				self.__clients = {}
+				self.__logging = logging.getLogger("ControlServer")
+
+			def open(self, pollingObject):
+				if os.path.exists(self.__path):
+					os.unlink(self.__path)
+				self.__socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+				self.__socket.setblocking(False)
+				self.__socket.bind(self.__path)
+				os.chmod(self.__path, 0o600)
+				self.__socket.listen()
+				pollingObject.register(self.__socket, select.POLLIN)
+				self.__logging.info("Listening on {}".format(self.__path))
+
+			def close(self):
+				for client, buffer in self.__clients.values():
+					client.close()
+				self.__clients.clear()
+				if self.__socket != None:
+					self.__socket.close()
+					self.__socket = None
+					os.unlink(self.__path)
+
+			def handles(self, fd):
+				return (self.__socket != None and fd == self.__socket.fileno()) or fd in self.__clients
+
+			def handleEvent(self, pollingObject, fd, flags):
+				if fd == self.__socket.fileno():
+					client, address = self.__socket.accept()
+					client.setblocking(False)
+					pollingObject.register(client, select.POLLIN)
+					self.__clients[client.fileno()] = [client, b'']
+					self.__logging.debug("Accepted client {}".format(client.fileno()))
+					return
 
-		def __init__(self, configFile="/etc/fancontroller.yml", verbosityLevel=logging.INFO):
+				client, buffer = self.__clients[fd]
+				data = b''
+				if flags & select.POLLIN:
+					try:
+						data = client.recv(4096)
+					except BlockingIOError:
+						return
+					except OSError:
+						data = b''
+				if not data:
+					self.__disconnect(pollingObject, fd)
+					return
+				buffer += data
+				while b'\n' in buffer:
+					line, buffer = buffer.split(b'\n', 1)
+					if line.strip():
+						response = self.__handleRequest(line)
+						try:
+							client.sendall(json.dumps(response).encode("utf-8") + b'\n')
+						except OSError:
+							self.__disconnect(pollingObject, fd)
+							return
+				if len(buffer) > self.maxRequestSize:
+					self.__logging.error("Dropping client {}, request too large".format(fd))
+					self.__disconnect(pollingObject, fd)
+					return
+				self.__clients[fd][1] = buffer
+
+			def __disconnect(self, pollingObject, fd):
+				client, buffer = self.__clients.pop(fd)
+				pollingObject.unregister(fd)
+				client.close()
+				self.__logging.debug("Client {} disconnected".format(fd))
+
+			def __handleRequest(self, line):
+				try:
+					request = json.loads(line.decode("utf-8"))
+					if type(request) != dict:
+						raise ValueError("request has to be an object")
+					command = request.get("command")
+					if command == "get":
+						result = self.__main.getSnapshot()
+					elif command == "override":
+						result = self.__override(request)
+					elif command in ("pause", "resume", "calibrate"):
+						result = self.__controllerCommand(command, request)
+					else:
+						raise ValueError("unknown command {}".format(command))
+					return { "ok" : True, "result" : result }
+				except Exception as e:
+					self.__logging.debug("Request {} failed: {}".format(line, traceback.format_exc()))
+					return { "ok" : False, "error" : str(e) }
+
+			def __override(self, request):
+				fan = self.__main.getFan(request.get("fan"))
+				if not fan.isPwm():
+					raise ValueError("fan {} is not pwm controlled".format(fan.getName()))
+				pwm = request.get("pwm")
+				if pwm == None:
+					fan.clearOverride()
+				else:
+					if type(pwm) != int or pwm < 0 or pwm > 255:
+						raise ValueError("pwm has to be an integer between 0 and 255")
+					duration = durations.Duration(str(request.get("duration", "10m"))).to_seconds()
+					if duration <= 0:
+						raise ValueError("duration has to be positive")
+					fan.setOverride(pwm, duration)
+				return fan.getSnapshot()
+
+			def __controllerCommand(self, command, request):
+				controller = self.__main.getController(request.get("controller"))
+				if command == "pause":
+					controller.pause()
+				elif command == "resume":
+					controller.resume()
+				elif not controller.calibrate():
+					raise ValueError("controller {} is already calibrating".format(controller.getName()))
+				return controller.getSnapshot()
+
+		def __init__(self, configFile="/etc/fancontroller.yml", verbosityLevel=logging.INFO, dryRun=False):
 			if platform.system() != "Linux":
 				raise PlatformError("FanController is only designed to be run on Linux! It can not work on any other platform")
 
 			self.__logging = logging.getLogger(__file__)
 			self.__logging.setLevel(verbosityLevel)
 			self.__configFile = configFile
+			# for --profile, nothing is written to the fans
+			self.__dryRun = dryRun
+			# cProfile.Profile objects of the controller threads, collected if not None
+			self.__profiles = None
+			self.__profilesLock = threading.Lock()
 
 			self.__threads = {}
 
 		def __parseConfigFile(self):
 			# expects a yaml file
-			contents = yaml.load(open(self.__configFile, "r"))
+			with open(self.__configFile, "r") as f:
+				contents = yaml.safe_load(f)
 			self.__settings = self.__configureSettings(contents["settings"])
 			fans = contents["fans"]
 			controllers = contents["controllers"]
 			sensors = contents["sensors"]
 
+			self.__backends = self.__configureBackends(contents.get("backends", []))
 			self.__sensors = self.__configureSensors(sensors)
 			self.__fans = self.__configureFans(fans)
 			self.__controllers = self.__configureControllers(self.__settings, controllers, self.__fans, self.__sensors)
@@ -569,7 +1513,8 @@ class FanController():
 			newSettings = {
 				"controlDelay" : 5,
 				"averagintTime" : 5,
-				"pollingTime" : 1
+				"pollingTime" : 1,
+				"actuatorTime" : 0.2
 			}
 			for key, value in settings.items():
 				asTime = False
@@ -583,6 +1528,48 @@ class FanController():
 					newSettings[key] = value
 			return newSettings
 
+		def __configureBackends(self, backends):
+			configuredBackends = {
+				"sysfs" : FanController.SysfsBackend()
+			}
+			types = {
+				"ipmi" : FanController.IpmiBackend
+			}
+			required = ["name", "type"]
+			success = True
+			for backend in backends:
+				valueDict = {}
+				valueDict.update(backend)
+				for req in required:
+					if req not in valueDict:
+						success = False
+						self.__logging.error("A backend does not have the required field {}".format(req))
+				if not success:
+					continue
+				if valueDict["name"] in configuredBackends:
+					success = False
+					self.__logging.error("The name {} for backends is already in use.".format(valueDict["name"]))
+				backendType = types.get(valueDict.pop("type"))
+				if backendType == None:
+					success = False
+					self.__logging.error("The backend {} has an unknown type, known are {}".format(valueDict["name"], ", ".join(types.keys())))
+					continue
+				configuredBackends[valueDict["name"]] = backendType(**valueDict)
+
+			if self.__dryRun:
+				for name, backend in configuredBackends.items():
+					configuredBackends[name] = FanController.DryRunBackend(backend)
+
+			if not success:
+				raise FanController.IncompleteConfiguration("Aborting the program, because the backends are misconfigured.")
+			return configuredBackends
+
+		def __resolveBackend(self, valueDict):
+			name = valueDict.get("backend", "sysfs")
+			if name not in self.__backends:
+				raise FanController.IncompleteConfiguration("The backend {} of {} is used, but not defined.".format(name, valueDict.get("name")))
+			valueDict["backend"] = self.__backends[name]
+
 		def __configureSensors(self, sensors):
 			configuredSensors = {}
 			defaults = {
@@ -606,6 +1593,7 @@ class FanController():
 					if req not in valueDict:
 						success = False
 						self.__logging.error("A sensor does not have the required field {}".format(req))
+				self.__resolveBackend(valueDict)
 				newSensor = FanController.TemperatureSensor(**valueDict)
 				configuredSensors[newSensor.getName()] = newSensor
 
@@ -633,6 +1621,7 @@ class FanController():
 					if req not in valueDict:
 						success = False
 						self.__logging.error("A fan does not have the required field {}".format(req))
+				self.__resolveBackend(valueDict)
 				newFan = FanController.Fan(**valueDict)
 				configuredFans[newFan.getName()] = newFan
 
@@ -674,7 +1663,7 @@ class FanController():
 									kwargs["outputs"].append(FanController.ControlledFan(configuredFan, points))
 								else:
 									kwargs["outputs"].append(configuredFan)
-					elif key == "name":
+					elif key in ("name", "allocation"):
 						kwargs[key] = value
 				newController = FanController.Controller(**kwargs)
 				configuredControllers[newController.getName()] = newController
@@ -686,9 +1675,42 @@ class FanController():
 		def __getSetting(self, value):
 			return self.__settings.get(value)
 
+		def getFan(self, name):
+			if name not in self.__fans:
+				raise ValueError("unknown fan {}".format(name))
+			return self.__fans[name]
+
+		def getController(self, name):
+			if name not in self.__controllers:
+				raise ValueError("unknown controller {}".format(name))
+			return self.__controllers[name]
+
+		def getSnapshot(self):
+			# the state of the last tick, nothing is read from the hardware
+			return {
+				"sensors" : { name : { "temperature" : sensor.getLastTemperature(), "health" : sensor.getHealthSnapshot() } for name, sensor in self.__sensors.items() },
+				"fans" : { name : fan.getSnapshot() for name, fan in self.__fans.items() },
+				"controllers" : { name : controller.getSnapshot() for name, controller in self.__controllers.items() }
+			}
+
 		def __runOneController(self, counter, controller):
-			controller.iterate()
-			counter.decrease()
+			# the counter has to go down even if the controller crashed, busyLoop waits for it
+			try:
+				if self.__profiles != None:
+					profile = cProfile.Profile()
+					profile.enable()
+					try:
+						controller.iterate()
+					finally:
+						profile.disable()
+						with self.__profilesLock:
+							self.__profiles.append(profile)
+				else:
+					controller.iterate()
+			except Exception as e:
+				self.__logging.error("Controller {} crashed: {}".format(controller.getName(), traceback.format_exc()))
+			finally:
+				counter.decrease()
 
 		def __runAllControllers(self):
 			self.__logging.debug("Running all controllers")
@@ -704,7 +1726,10 @@ class FanController():
 			for thread in threading.enumerate():
 				self.__threads[thread.ident] = thread
 			
-		def busyLoop(self):
+		def busyLoop(self, ticks = None):
+			"""
+			Runs the controllers every pollingTime, forever or for the given number of ticks
+			"""
 			self.__logging.debug("Entered busyLoop method.")
 			pollingObject = select.poll()
 			localSocket, remoteSocket = socket.socketpair(type=socket.SOCK_DGRAM)
@@ -714,32 +1739,101 @@ class FanController():
 			wakerThread.start()
 			wakerThreadSockets = { localSocket.fileno() : localSocket }
 			self.__endOfLoopWaiterObject = threading.Condition()
-			while True:
-				self.__logging.debug("Loop iteration.")
-				fdStructures = pollingObject.poll()
-				for fd, flags in fdStructures:
-					if fd in wakerThreadSockets:
-						self.__logging.debug("Got message from waker thread.")
-						if flags & select.POLLIN:
-							self.__logging.debug("Got pollin for wakerThreadSocket {}".format(fd))
-							self.__runAllControllers()
+			rampedFans = [ fan for fan in self.__fans.values() if fan.enableRamping() ]
+			actuatorObject = FanController.Main.Actuator(rampedFans, self.__getSetting("actuatorTime"))
+			if rampedFans:
+				actuatorThread = threading.Thread(target=actuatorObject.Main)
+				actuatorThread.start()
+			controlServer = None
+			if self.__getSetting("controlSocket"):
+				controlServer = FanController.Main.ControlServer(self.__getSetting("controlSocket"), self)
+				controlServer.open(pollingObject)
+			ranTicks = 0
+			try:
+				while ticks == None or ranTicks < ticks:
+					self.__logging.debug("Loop iteration.")
+					fdStructures = pollingObject.poll()
+					ranControllers = False
+					woken = False
+					for fd, flags in fdStructures:
+						if fd in wakerThreadSockets:
+							self.__logging.debug("Got message from waker thread.")
+							woken = woken or flags & select.POLLIN
+							if flags & select.POLLIN and not ranControllers and self.__controllers:
+								self.__logging.debug("Got pollin for wakerThreadSocket {}".format(fd))
+								tickStart = time.perf_counter()
+								for fan in self.__fans.values():
+									fan.hasOverride()
+								for backend in self.__backends.values():
+									backend.beginTick()
+								# hold the condition while starting the threads, so the notification can't get lost
+								self.__endOfLoopWaiterObject.acquire()
+								self.__runAllControllers()
+								ranControllers = True
 							localSocket.recvmsg(9000)
-				self.__logging.debug("End of an iteration of the busyLoop")
-				self.__endOfLoopWaiterObject.acquire()
-				self.__endOfLoopWaiterObject.wait()
-				self.__endOfLoopWaiterObject.release()
-				self.__logging.debug("Synchronized threads")
-				self.__filterRunningThreads()
+						elif controlServer != None and controlServer.handles(fd):
+							controlServer.handleEvent(pollingObject, fd, flags)
+					self.__logging.debug("End of an iteration of the busyLoop")
+					if ranControllers:
+						self.__endOfLoopWaiterObject.wait()
+						self.__endOfLoopWaiterObject.release()
+						self.__logging.debug("Synchronized threads")
+						with FanController.timings.measure("flush"):
+							for backend in self.__backends.values():
+								backend.flush()
+						self.__filterRunningThreads()
+						if FanController.timings.isEnabled():
+							FanController.timings.add("tick", time.perf_counter() - tickStart)
+					# every wakeup is a tick, even without controllers, so a limited loop always ends
+					if woken:
+						ranTicks += 1
+			finally:
+				wakerObject.stop()
+				actuatorObject.stop()
+				if controlServer != None:
+					controlServer.close()
+				for backend in self.__backends.values():
+					backend.close()
 
-			for thread in self.__threads.value():
-				self.__threads.pop(thread.ident)
-				del(thread)
+			self.__threads.clear()
 
 		def run(self):
 			self.__logging.debug("Entered Main.run.")
 			self.__parseConfigFile()
 			self.busyLoop()
 
+		def profile(self, ticks, outputFile = None):
+			"""
+			Runs the configured loop for the given number of ticks and prints how long its phases took.
+			The fans are not touched if the Main object was created with dryRun. If outputFile is given,
+			the cProfile statistics of all threads running controllers are dumped to it.
+			"""
+			self.__logging.debug("Entered Main.profile.")
+			FanController.timings.enable()
+			profile = None
+			if outputFile != None:
+				# since Python 3.12 only one profiler can be active and it records all threads,
+				# before that every controller thread needs its own
+				if sys.version_info < (3, 12):
+					self.__profiles = []
+				profile = cProfile.Profile()
+				profile.enable()
+			with FanController.timings.measure("config parse"):
+				self.__parseConfigFile()
+			# don't take over the socket of a running instance
+			self.__settings["controlSocket"] = None
+			self.busyLoop(ticks)
+			if profile != None:
+				profile.disable()
+				stats = pstats.Stats(profile)
+				for threadProfile in self.__profiles or []:
+					stats.add(threadProfile)
+				stats.dump_stats(outputFile)
+			print(FanController.timings.report())
+
+
+	# shared by all objects, so the phases can be measured without passing it around
+	timings = Timings()
 
 	# method of the FanController class
 	def run(self):
@@ -759,6 +1853,19 @@ class FanController():
 			type=int,
 			default=logging.INFO)
 
+		parser.add_argument("--profile",
+			dest="profileTicks",
+			metavar="N",
+			help="run the configured loop for N ticks without writing to the fans and print how long each phase took",
+			type=int,
+			default=None)
+
+		parser.add_argument("--profile-output",
+			dest="profileOutput",
+			metavar="FILE",
+			help="with --profile, dump the cProfile statistics to FILE",
+			default=None)
+
 		args = parser.parse_args()
 
 		logging.basicConfig(
@@ -767,6 +1874,11 @@ class FanController():
 			stream=sys.stdout
 			)
 
+		if args.profileTicks != None:
+			main = FanController.Main(args.configFile, args.verbosity, dryRun=True)
+			main.profile(args.profileTicks, args.profileOutput)
+			return
+
 		main = FanController.Main(args.configFile, args.verbosity)
 
 		main.run()
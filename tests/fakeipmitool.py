@@ -0,0 +1,58 @@
+#! /usr/bin/python3 -B
+
+# Stands in for ipmitool in the tests. Every started process and every command is appended to the
+# file named by FAKE_IPMITOOL_LOG. With FAKE_IPMITOOL_NOSHELL set, "shell" fails. If the file named by
+# FAKE_IPMITOOL_FAIL_RAW exists, the next raw command fails like ipmitool does and the file is removed.
+# FAKE_IPMITOOL_SDR_DELAY makes sdr take that many seconds, like a slow BMC.
+
+import os
+import sys
+import time
+
+sdr = """CPU Temp         | 52 degrees C      | ok
+System Temp      | 31 degrees C      | ok
+FAN1             | 1200 RPM          | ok
+PCH Temp         | no reading        | ns
+"""
+
+def log(line):
+	with open(os.environ["FAKE_IPMITOOL_LOG"], "a") as f:
+		f.write(line + "\n")
+
+def run(command):
+	log("command " + " ".join(command))
+	if command[:1] == ["sdr"]:
+		time.sleep(float(os.environ.get("FAKE_IPMITOOL_SDR_DELAY", 0)))
+		sys.stdout.write(sdr)
+		return 0
+	if command[:1] == ["raw"]:
+		failRaw = os.environ.get("FAKE_IPMITOOL_FAIL_RAW")
+		if failRaw and os.path.exists(failRaw):
+			os.unlink(failRaw)
+			sys.stderr.write("Unable to send RAW command (channel=0x0 netfn=0x30 lun=0x0 cmd=0x70 rsp=0xc1): Invalid command\n")
+			sys.stderr.flush()
+			return 1
+		sys.stdout.write("\n")
+		return 0
+	sys.stderr.write("Invalid command: {}\n".format(" ".join(command)))
+	return 1
+
+arguments = sys.argv[1:]
+# skip options like -I lanplus
+while arguments and arguments[0].startswith("-"):
+	arguments = arguments[2:]
+log("exec " + " ".join(arguments))
+
+if arguments == ["shell"]:
+	if os.environ.get("FAKE_IPMITOOL_NOSHELL"):
+		sys.exit(1)
+	while True:
+		sys.stdout.write("ipmitool> ")
+		sys.stdout.flush()
+		line = sys.stdin.readline()
+		if not line or line.strip() == "exit":
+			break
+		run(line.split())
+		sys.stdout.flush()
+else:
+	sys.exit(run(arguments))
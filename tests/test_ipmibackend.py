@@ -0,0 +1,109 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fancontroller import FanController
+
+fakeIpmitool = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fakeipmitool.py")
+
+class IpmiBackendTest(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.log = os.path.join(self.directory.name, "log")
+		self.failRaw = os.path.join(self.directory.name, "failRaw")
+		os.environ["FAKE_IPMITOOL_LOG"] = self.log
+		os.environ["FAKE_IPMITOOL_FAIL_RAW"] = self.failRaw
+		os.environ.pop("FAKE_IPMITOOL_NOSHELL", None)
+		os.environ.pop("FAKE_IPMITOOL_SDR_DELAY", None)
+
+	def tearDown(self):
+		os.environ.pop("FAKE_IPMITOOL_NOSHELL", None)
+		os.environ.pop("FAKE_IPMITOOL_SDR_DELAY", None)
+		self.directory.cleanup()
+
+	def readLog(self):
+		with open(self.log) as f:
+			return f.read().splitlines()
+
+	def runTicks(self, backend):
+		# zone 0 has two fans, the faster one wins. Zone 1 only changes in the third tick.
+		ticks = [
+			{ ("cpu", 0) : 100, ("top", 0) : 150, ("periph", 1) : 80 },
+			{ ("cpu", 0) : 100, ("top", 0) : 150, ("periph", 1) : 80 },
+			{ ("cpu", 0) : 200, ("top", 0) : 150, ("periph", 1) : 90 },
+		]
+		temperatures = []
+		for tick in ticks:
+			backend.beginTick()
+			temperatures.append((backend.readTemperature("CPU Temp", 1), backend.readTemperature("System Temp", 1),
+				backend.readTemperature("PCH Temp", 1)))
+			for (name, zone), pwm in tick.items():
+				backend.writePwm(zone, pwm, name)
+			backend.flush()
+		return temperatures
+
+	def testBatching(self):
+		backend = FanController.IpmiBackend("bmc", ipmitool=fakeIpmitool, arguments=["-I", "lanplus"])
+		temperatures = self.runTicks(backend)
+		backend.close()
+		self.assertEqual(temperatures, [(52, 31, None)]*3)
+		self.assertEqual(self.readLog(), [
+			"exec shell",
+			"command sdr",
+			"command raw 0x30 0x70 0x66 0x01 0x00 0x3b",
+			"command raw 0x30 0x70 0x66 0x01 0x01 0x1f",
+			"command sdr",
+			"command sdr",
+			"command raw 0x30 0x70 0x66 0x01 0x00 0x4e",
+			"command raw 0x30 0x70 0x66 0x01 0x01 0x23",
+		])
+
+	def testWithoutShell(self):
+		os.environ["FAKE_IPMITOOL_NOSHELL"] = "1"
+		backend = FanController.IpmiBackend("bmc", ipmitool=fakeIpmitool)
+		self.runTicks(backend)
+		backend.close()
+		commands = self.readLog()
+		self.assertEqual(commands.count("exec shell"), 1)
+		self.assertEqual(len([ line for line in commands if line == "command sdr" ]), 3)
+		self.assertEqual(len([ line for line in commands if line.startswith("command raw") ]), 4)
+		self.assertEqual(len([ line for line in commands if line.startswith("exec") ]), 8)
+
+	def testFailedRawIsResent(self):
+		for shell in (True, False):
+			with self.subTest(shell=shell):
+				open(self.log, "w").close()
+				open(self.failRaw, "w").close()
+				backend = FanController.IpmiBackend("bmc", ipmitool=fakeIpmitool, shell=shell)
+				backend.writePwm(0, 255, "cpu")
+				backend.flush()
+				self.assertFalse(os.path.exists(self.failRaw))
+				backend.flush()
+				backend.flush()
+				backend.close()
+				raws = [ line for line in self.readLog() if line.startswith("command raw") ]
+				self.assertEqual(raws, ["command raw 0x30 0x70 0x66 0x01 0x00 0x64"]*2)
+
+	def testSlowSdrDoesNotBlockWrites(self):
+		os.environ["FAKE_IPMITOOL_SDR_DELAY"] = "1"
+		backend = FanController.IpmiBackend("bmc", ipmitool=fakeIpmitool, shell=False)
+		backend.beginTick()
+		reader = threading.Thread(target=backend.readTemperature, args=("CPU Temp", 1))
+		reader.start()
+		# let the reader start the sdr command
+		time.sleep(0.2)
+		start = time.monotonic()
+		backend.writePwm(0, 255, "cpu")
+		self.assertEqual(backend.readPwm(0), 255)
+		self.assertLess(time.monotonic() - start, 0.5)
+		reader.join()
+		self.assertEqual(backend.readTemperature("CPU Temp", 1), 52)
+		backend.close()
+
+if __name__ == '__main__':
+	unittest.main()
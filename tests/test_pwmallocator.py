@@ -0,0 +1,108 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fancontroller import FanController
+
+class FakeFan():
+	# the parts of FanController.Fan the allocator uses
+	def __init__(self, name, maxRot = 1000, minPwm = 0, loudThreshold = 255):
+		self.__name = name
+		self.__maxRot = maxRot
+		self.__minPwm = minPwm
+		self.__loudThreshold = loudThreshold
+
+	def getName(self):
+		return self.__name
+
+	def getMaxRot(self):
+		return self.__maxRot
+
+	def getMinPwm(self):
+		return self.__minPwm
+
+	def getLoudThreshold(self):
+		return self.__loudThreshold
+
+	def pwmToRot(self, pwmValue):
+		return (pwmValue/255)*self.__maxRot
+
+	def rotToPwm(self, rot):
+		return (rot/self.__maxRot)*255
+
+def cost(fan, pwmValue, exponent = 5, loudPenalty = 4):
+	# only the part above the loud threshold pays the penalty
+	quiet = min(pwmValue, fan.getLoudThreshold())
+	loud = max(pwmValue, fan.getLoudThreshold())
+	return (quiet/255)**exponent + loudPenalty*((loud/255)**exponent - (fan.getLoudThreshold()/255)**exponent)
+
+class PwmAllocatorTest(unittest.TestCase):
+	def rotSum(self, fans, allocation):
+		return sum([fan.pwmToRot(allocation[fan.getName()]) for fan in fans])
+
+	def allocate(self, allocator, fans, requestedRot):
+		allocation = allocator.allocate(fans, requestedRot)
+		self.assertEqual(sorted(allocation.keys()), sorted([fan.getName() for fan in fans]))
+		return allocation
+
+	def testUnknownMode(self):
+		with self.assertRaises(ValueError):
+			FanController.PwmAllocator("silence")
+
+	def testSumIsPreserved(self):
+		fans = [FakeFan("a", maxRot = 1200), FakeFan("b", maxRot = 2000, loudThreshold = 150), FakeFan("c", maxRot = 800, minPwm = 40)]
+		for mode in ["noise", "power"]:
+			allocator = FanController.PwmAllocator(mode)
+			for requestedRot in [1000, 1800, 2600, 3500]:
+				with self.subTest(mode = mode, requestedRot = requestedRot):
+					allocation = self.allocate(allocator, fans, requestedRot)
+					# every fan may be half a pwm step off after rounding
+					tolerance = sum([fan.getMaxRot()/255/2 for fan in fans])
+					self.assertAlmostEqual(self.rotSum(fans, allocation), requestedRot, delta = tolerance)
+
+	def testEqualFansShareEqually(self):
+		fans = [FakeFan("a"), FakeFan("b")]
+		allocation = self.allocate(FanController.PwmAllocator("noise"), fans, 1000)
+		self.assertEqual(allocation, {"a" : 128, "b" : 128})
+
+	def testSpreadingIsQuieter(self):
+		fans = [FakeFan("a"), FakeFan("b")]
+		allocation = self.allocate(FanController.PwmAllocator("noise"), fans, 1000)
+		spread = sum([cost(fan, allocation[fan.getName()]) for fan in fans])
+		# one fan at 100% and the other off moves the same air
+		single = cost(fans[0], 255) + cost(fans[1], 0)
+		self.assertLess(spread, single/10)
+
+	def testMinPwm(self):
+		fans = [FakeFan("a", minPwm = 80), FakeFan("b")]
+		allocation = self.allocate(FanController.PwmAllocator("noise"), fans, FakeFan("x").pwmToRot(100))
+		self.assertEqual(allocation, {"a" : 80, "b" : 20})
+
+	def testMaxRot(self):
+		fans = [FakeFan("a", maxRot = 1000), FakeFan("b", maxRot = 3000)]
+		allocator = FanController.PwmAllocator("noise")
+		self.assertEqual(self.allocate(allocator, fans, 4000), {"a" : 255, "b" : 255})
+		self.assertEqual(self.allocate(allocator, fans, 10000), {"a" : 255, "b" : 255})
+		# the bigger fan moves more air for the same noise
+		allocation = self.allocate(allocator, fans, 2000)
+		self.assertGreater(allocation["b"], allocation["a"])
+
+	def testLoudThreshold(self):
+		fans = [FakeFan("a", loudThreshold = 100), FakeFan("b")]
+		allocator = FanController.PwmAllocator("noise")
+		# below the threshold both fans are the same
+		self.assertEqual(self.allocate(allocator, fans, FakeFan("x").pwmToRot(180)), {"a" : 90, "b" : 90})
+		# then a stays on its threshold while b takes the rest
+		for total in [210, 230, 240]:
+			with self.subTest(total = total):
+				allocation = self.allocate(allocator, fans, FakeFan("x").pwmToRot(total))
+				self.assertEqual(allocation, {"a" : 100, "b" : total - 100})
+		# until b's marginal cost reaches the penalty, at 4**(1/4) times the threshold
+		allocation = self.allocate(allocator, fans, FakeFan("x").pwmToRot(300))
+		self.assertGreater(allocation["a"], 100)
+		self.assertAlmostEqual(allocation["b"], allocation["a"]*4**(1/4), delta = 1)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fancontroller import FanController
+
+def feed(health, value):
+	# the same steps TemperatureSensor takes for every read
+	if health.isOutlier(value) and health.reject():
+		return health.getLastSample()
+	health.accept(value)
+	return value
+
+class SensorHealthTest(unittest.TestCase):
+	def testSpikeIsRejected(self):
+		health = FanController.SensorHealth()
+		for value in [40, 41, 40, 42, 41]:
+			self.assertEqual(feed(health, value), value)
+		self.assertTrue(health.isOutlier(127))
+		self.assertFalse(health.isOutlier(43))
+		# the last good sample stands in for the spike
+		self.assertEqual(feed(health, 127), 41)
+		self.assertEqual(feed(health, 41), 41)
+		self.assertEqual(health.getSnapshot()["rejections"], 0)
+
+	def testMinDeviation(self):
+		health = FanController.SensorHealth(minDeviation = 5)
+		for value in [40, 40, 40, 40]:
+			feed(health, value)
+		# a MAD of 0 would reject every change without the minimum deviation
+		self.assertFalse(health.isOutlier(45))
+		self.assertTrue(health.isOutlier(46))
+
+	def testNeedsSamples(self):
+		health = FanController.SensorHealth()
+		feed(health, 40)
+		feed(health, 40)
+		self.assertFalse(health.isOutlier(100))
+
+	def testPersistentChangeIsAccepted(self):
+		health = FanController.SensorHealth(maxRejections = 3)
+		for value in [40, 41, 40, 42, 41]:
+			feed(health, value)
+		self.assertEqual(feed(health, 70), 41)
+		self.assertEqual(feed(health, 70), 41)
+		# the third read in a row is a real change
+		self.assertEqual(feed(health, 70), 70)
+		self.assertEqual(health.getLastSample(), 70)
+		# the old samples are gone, so the new level isn't an outlier
+		self.assertEqual(feed(health, 71), 71)
+		self.assertFalse(health.isOutlier(70))
+
+	def testSpikeThenPersistentChange(self):
+		health = FanController.SensorHealth(maxRejections = 3)
+		for value in [40, 41, 40, 42, 41]:
+			feed(health, value)
+		self.assertEqual(feed(health, 127), 41)
+		self.assertEqual(feed(health, 41), 41)
+		# the spike doesn't count towards the change that follows
+		self.assertEqual(feed(health, 70), 41)
+		self.assertEqual(feed(health, 70), 41)
+		self.assertEqual(feed(health, 70), 70)
+
+	def testBackoff(self):
+		health = FanController.SensorHealth(backoff = 1, maxBackoff = 10)
+		self.assertFalse(health.isBackingOff())
+		delays = [health.recordFailure() for i in range(6)]
+		self.assertEqual(delays, [1, 2, 4, 8, 10, 10])
+		self.assertEqual(health.getFailures(), 6)
+		self.assertTrue(health.isBackingOff())
+
+	def testBackoffExpires(self):
+		health = FanController.SensorHealth(backoff = 0.05)
+		health.recordFailure()
+		self.assertTrue(health.isBackingOff())
+		time.sleep(0.1)
+		self.assertFalse(health.isBackingOff())
+
+	def testAcceptResetsBackoff(self):
+		health = FanController.SensorHealth(backoff = 1)
+		health.recordFailure()
+		health.recordFailure()
+		health.accept(40)
+		self.assertFalse(health.isBackingOff())
+		self.assertEqual(health.getFailures(), 0)
+		self.assertEqual(health.recordFailure(), 1)
+
+	def testLastSample(self):
+		health = FanController.SensorHealth()
+		self.assertEqual(health.getLastSample(), None)
+		feed(health, 40)
+		self.assertEqual(health.getLastSample(), 40)
+
+if __name__ == '__main__':
+	unittest.main()